@@ -0,0 +1,248 @@
+import argparse
+import contextlib
+import glob
+import io
+import math
+import time
+import tracemalloc
+
+import psycopg2.extensions
+import tabulate
+
+from helper import read_phi_from_file, get_db_connection
+from mf_processor import MFStructure
+
+DEFAULT_SAMPLE_RATES = [0.5, 0.1, 0.01]
+
+
+def _make_mf(phi):
+    """Create an MFStructure from Phi operator arguments"""
+    return MFStructure(
+        select_attrs=','.join(phi.select_attrs),
+        grouping_vars=str(phi.num_grouping_vars),
+        grouping_attrs=','.join(phi.grouping_attrs),
+        f_vect=','.join(phi.f_vect),
+        conditions=';'.join(phi.conditions),
+        having=phi.having,
+        grouping_sets=phi.grouping_sets
+    )
+
+
+def _run(phi, cursor, sample_rate=None, seed=None):
+    """Run a query quietly, returning (results, elapsed seconds)"""
+    mf = _make_mf(phi)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = mf.process_all_scans(cursor, sample_rate=sample_rate, seed=seed)
+    return results, time.perf_counter() - start
+
+
+def compare_results(phi, exact, approx):
+    """
+    Compare approximate results to exact ones
+
+    Returns a (mean relative error, interval coverage, missing groups) tuple.
+    Coverage is the fraction of exact values inside the reported confidence
+    intervals; missing groups are exact groups absent from the approximation.
+    """
+    def key(row):
+        return tuple(row.get(attr) for attr in phi.grouping_attrs)
+
+    approx_by_key = {key(row): row for row in approx}
+    errors = []
+    covered = 0
+    intervals = 0
+    missing = 0
+    for row in exact:
+        estimate = approx_by_key.get(key(row))
+        if estimate is None:
+            missing += 1
+            continue
+        for f in phi.select_attrs:
+            if f in phi.grouping_attrs or f not in row:
+                continue
+            # Aggregates over no rows (e.g. max of nothing is -inf) have no error to measure
+            if row[f] and math.isfinite(row[f]) and math.isfinite(estimate[f]):
+                errors.append(abs(estimate[f] - row[f]) / abs(row[f]))
+            half_width = estimate.get(f + '_ci')
+            if half_width is not None:
+                intervals += 1
+                if abs(estimate[f] - row[f]) <= half_width:
+                    covered += 1
+
+    mean_error = sum(errors) / len(errors) if errors else 0.0
+    coverage = covered / intervals if intervals else None
+    return mean_error, coverage, missing
+
+
+def _dict_row_scans(rows, phi, columns):
+    """
+    Row processing as it was before positional decoding
+
+    Every grouping variable scans the rows; each row is converted to a dict
+    for the condition check and again for the aggregate update, and values
+    are coerced from strings by _check_condition. Groups are keyed and
+    pruned like in MFStructure._scan(), so both paths build the same groups.
+    """
+    mf = _make_mf(phi)
+    multi_key = len(mf.grouping_attrs) > 1
+    for scan in range(mf.num_grouping_vars):
+        for row in rows:
+            if mf._check_condition(dict(zip(columns, row)), mf.conditions[scan]):
+                tuple_data = dict(zip(columns, row))
+                if multi_key:
+                    group_key = tuple(tuple_data[attr] for attr in mf.grouping_attrs)
+                else:
+                    group_key = tuple_data[mf.grouping_attrs[0]]
+                if group_key not in mf.mf_struct:
+                    mf.mf_struct[group_key] = mf._initialize_aggregates()
+                    for attr in mf.grouping_attrs:
+                        mf.mf_struct[group_key][attr] = tuple_data[attr]
+                if scan == 0:
+                    mf.seeded.add(group_key)
+                mf._update_aggregates(group_key, tuple_data, scan)
+    mf._prune_groups()
+    return len(mf.mf_struct)
+
+
+def _positional_scan(rows, mf, scans):
+    """Row processing with positional decoding and bound predicates"""
+    mf.mf_struct = {}
+    mf.seeded = set()
+    mf._scan(rows, scans)
+    mf._prune_groups()
+    return len(mf.mf_struct)
+
+
+class _AllocationMeter:
+    """
+    Iterate over rows, adding up the memory allocated while each row is processed
+
+    CPython has no cumulative allocation counter, so tracemalloc's peak is
+    reset as every row is handed out; the peak above the level at that
+    point is the memory the row's processing allocated, even when it is
+    freed again before the next row (like per-row dicts).
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.allocated = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            yield row
+            self.allocated += tracemalloc.get_traced_memory()[1] - start
+
+
+def _measure(func, rows, *args):
+    """Return (elapsed seconds, bytes allocated per row, result) of func(rows, *args)"""
+    start = time.perf_counter()
+    result = func(rows, *args)
+    elapsed = time.perf_counter() - start
+
+    # Allocations are traced in a second run so tracing does not skew the timing
+    meter = _AllocationMeter(rows)
+    tracemalloc.start()
+    func(meter, *args)
+    tracemalloc.stop()
+    return elapsed, meter.allocated / len(rows) if rows else 0, result
+
+
+def measure_scan_overhead(phi, cursor):
+    """
+    Compare per-row processing cost of dict rows and positional rows
+
+    The sales rows are fetched once and both approaches run over the same
+    in-memory rows, so only row decoding, condition checks and aggregate
+    updates are measured. Returns a list of table rows.
+    """
+    mf = _make_mf(phi)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scans = mf.plan_scans(cursor)['scans']
+    tuple_cursor = cursor.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+    tuple_cursor.execute(f"SELECT {', '.join(mf.columns)} FROM sales")
+    rows = tuple_cursor.fetchall()
+    tuple_cursor.close()
+
+    table = []
+    for name, func, args in [
+        ('dict rows', _dict_row_scans, (phi, mf.columns)),
+        ('positional rows', _positional_scan, (mf, scans)),
+    ]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, allocated, groups = _measure(func, rows, *args)
+        rate = len(rows) / elapsed if elapsed > 0 else 0
+        table.append([name, len(rows), groups, f"{elapsed:.3f}", f"{rate:,.0f}", f"{allocated:,.0f}"])
+    return table
+
+
+def main(argv=None):
+    """Benchmark approximate mode against exact results on the input/ queries"""
+    parser = argparse.ArgumentParser(description="Speed/accuracy trade-off of approximate EMF queries")
+    parser.add_argument('files', nargs='*', help="query input files (default: input/*.txt)")
+    parser.add_argument('--rates', type=float, nargs='+', default=DEFAULT_SAMPLE_RATES,
+                        help="sample rates to benchmark")
+    parser.add_argument('--seed', type=int, default=562, help="seed for the block samples")
+    parser.add_argument('--scan-overhead', action='store_true',
+                        help="compare rows/sec and allocations per row of dict rows and positional rows instead")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect to database!")
+        return
+    cur = conn.cursor()
+
+    if args.scan_overhead:
+        table = []
+        for file_path in args.files or sorted(glob.glob('input/*.txt')):
+            phi = read_phi_from_file(file_path)
+            if phi is None:
+                print(f"Skipping {file_path}: invalid Phi arguments")
+                continue
+            try:
+                table.extend([file_path] + row for row in measure_scan_overhead(phi, cur))
+            except Exception as e:
+                conn.rollback()
+                print(f"Skipping {file_path}: {e}")
+        conn.close()
+        print(tabulate.tabulate(
+            table,
+            headers=['query', 'row processing', 'rows', 'groups', 'time (s)', 'rows/sec', 'bytes allocated/row'],
+            tablefmt="psql"
+        ))
+        return
+
+    table = []
+    for file_path in args.files or sorted(glob.glob('input/*.txt')):
+        phi = read_phi_from_file(file_path)
+        if phi is None:
+            print(f"Skipping {file_path}: invalid Phi arguments")
+            continue
+        try:
+            exact, exact_time = _run(phi, cur)
+            table.append([file_path, 'exact', f"{exact_time:.3f}", '1.0x', len(exact), '-', '-', '-'])
+            for rate in args.rates:
+                approx, approx_time = _run(phi, cur, sample_rate=rate, seed=args.seed)
+                mean_error, coverage, missing = compare_results(phi, exact, approx)
+                table.append([
+                    file_path, rate, f"{approx_time:.3f}",
+                    f"{exact_time / approx_time:.1f}x" if approx_time > 0 else '-',
+                    len(approx), f"{mean_error:.2%}",
+                    f"{coverage:.0%}" if coverage is not None else '-', missing
+                ])
+        except Exception as e:
+            conn.rollback()
+            print(f"Skipping {file_path}: {e}")
+
+    conn.close()
+    print(tabulate.tabulate(
+        table,
+        headers=['query', 'sample rate', 'time (s)', 'speedup', 'groups', 'mean rel. error', 'CI coverage', 'missing groups'],
+        tablefmt="psql"
+    ))
+
+
+if __name__ == "__main__":
+    main()
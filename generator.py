@@ -1,4 +1,5 @@
 import subprocess
+import sys
 from helper import get_phi_args
 
 def generate_code(phi):
@@ -11,17 +12,21 @@ def generate_code(phi):
     """
     
     # Generate complete program code
-    program_code = f"""import os
+    program_code = f"""import argparse
+import os
 import psycopg2
 import psycopg2.extras
-import tabulate
 from dotenv import load_dotenv
 from mf_processor import MFStructure
+from sinks import TabulateSink, open_sink
 
-def query():
+def query(mode=None, sample_rate=None, output=None):
     \"\"\"
     Execute the EMF query using MFStructure.
-    Returns formatted results table.
+    Returns formatted results table, or the query plan when mode is
+    'explain' or 'explain-analyze'. With a sample_rate the results are
+    approximate, with confidence intervals. With an output path (.csv,
+    .jsonl or .emfc) results are streamed to that file instead.
     \"\"\"
     try:
         # Database connection setup
@@ -43,9 +48,15 @@ def query():
             grouping_attrs="{','.join(phi.grouping_attrs)}",
             f_vect="{','.join(phi.f_vect)}",
             conditions="{';'.join(phi.conditions)}",
-            having="{phi.having}"
+            having="{phi.having}",
+            grouping_sets="{phi.grouping_sets}"
         )
         
+        if mode in ('explain', 'explain-analyze'):
+            plan = mf.explain(cur, analyze=(mode == 'explain-analyze'))
+            conn.close()
+            return plan
+
         # Process EMF query using algorithm 3.1
         print("\\nExecuting EMF query...")
         print("Original query specifications:")
@@ -56,23 +67,45 @@ def query():
         print("- Conditions: {'; '.join(phi.conditions)}")
         if "{phi.having}" != "-":
             print("- Having clause: {phi.having}")
+        if "{phi.grouping_sets}" != "-":
+            print("- Grouping sets: {phi.grouping_sets}")
         
-        # Execute query and get results
-        results = mf.process_all_scans(cur)
+        # Execute query, streaming results to a file or a table
+        sink = open_sink(output) if output else TabulateSink()
+        with sink:
+            count = mf.process_all_scans(cur, sample_rate=sample_rate, sink=sink)
         
         conn.close()
         
         # Format and return results
-        if not results:
+        if output:
+            return f"Wrote {{count}} rows to {{output}}"
+        if not count:
             return "No results found."
-        return tabulate.tabulate(results, headers="keys", tablefmt="psql")
+        return sink.getvalue()
         
     except Exception as ex:
         return f"Error executing query: {{str(ex)}}"
 
 def main():
     \"\"\"Main function to execute query and display results\"\"\"
-    print(query())
+    parser = argparse.ArgumentParser(description="Run the generated EMF query")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--explain', dest='mode', action='store_const', const='explain',
+                      help="show the query plan instead of the results")
+    mode.add_argument('--explain-analyze', dest='mode', action='store_const', const='explain-analyze',
+                      help="run the query and show the plan with actual rows and time")
+    parser.add_argument('--sample', type=float, metavar='RATE',
+                        help="approximate results from a block sample of this fraction of the table")
+    parser.add_argument('--output', metavar='PATH',
+                        help="stream results to a .csv, .jsonl or .emfc file")
+    args = parser.parse_args()
+
+    if args.sample is not None and not 0 < args.sample <= 1:
+        parser.error("--sample must be in (0, 1]")
+    if args.mode and (args.sample is not None or args.output):
+        parser.error("--sample and --output cannot be combined with --explain or --explain-analyze")
+    print(query(args.mode, args.sample, args.output))
 
 if __name__ == "__main__":
     main()"""
@@ -83,10 +116,16 @@ if __name__ == "__main__":
     
     return program_code
 
-def main():
+def main(args=()):
     """
     Main function to generate and execute query processing code.
     Gets Phi arguments and generates corresponding Python code.
+    
+    Parameters:
+    - args: extra arguments passed to the generated program
+      (--explain or --explain-analyze to show the query plan,
+      --sample RATE for approximate results from a block sample,
+      --output PATH to stream results to a .csv, .jsonl or .emfc file)
     """
     # Get Phi arguments
     print("Getting Phi operator arguments...")
@@ -104,7 +143,7 @@ def main():
         
         # Execute generated code
         print("\nExecuting generated code...")
-        result = subprocess.run(["python", "_generated.py"], capture_output=True, text=True)
+        result = subprocess.run(["python", "_generated.py", *args], capture_output=True, text=True)
         
         if result.stderr:
             print("Errors during execution:")
@@ -116,4 +155,4 @@ def main():
         print(f"Error during code generation or execution: {str(e)}")
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
@@ -12,6 +12,7 @@ class PhiOperator:
         self.f_vect = None            # F: List of aggregate functions
         self.conditions = None        # σ: List of predicates/conditions
         self.having = None           # G: Having clause predicate
+        self.grouping_sets = '-'      # Grouping sets over V (ROLLUP, CUBE, explicit sets or '-')
     
     def is_valid(self):
         """Validate that all required arguments are set"""
@@ -51,6 +52,9 @@ def read_phi_from_file(file_path):
             elif line == 'HAVING CLAUSE (G):':
                 phi.having = lines[i+1].strip()
                 i += 2
+            elif line == 'GROUPING SETS:':
+                phi.grouping_sets = lines[i+1].strip()
+                i += 2
             else:
                 i += 1
     
@@ -90,6 +94,8 @@ def get_phi_from_user():
         
         phi.having = input("Enter HAVING clause (or '-' for none): ")
         
+        phi.grouping_sets = input("Enter grouping sets (ROLLUP, CUBE, e.g. (cust, prod), (cust), () or '-' for none): ").strip() or '-'
+        
         return phi if phi.is_valid() else None
     
     except Exception as e:
@@ -156,6 +162,7 @@ if __name__ == "__main__":
         print(f"Aggregate Functions: {phi.f_vect}")
         print(f"Conditions: {phi.conditions}")
         print(f"Having Clause: {phi.having}")
+        print(f"Grouping Sets: {phi.grouping_sets}")
     
     # Test database connection
     print("\nTesting database connection:")
@@ -0,0 +1,210 @@
+import argparse
+import csv
+import functools
+import io
+import random
+import re
+import time
+from datetime import date
+
+from helper import get_db_connection
+
+# Column order of the sales table (matches the CREATE TABLE in the load script)
+SALES_COLUMNS = ('cust', 'prod', 'day', 'month', 'year', 'state', 'quant', 'date')
+
+DEFAULT_SQL_SCRIPT = 'load_sales_10000_table (NEW).sql'
+DEFAULT_BATCH_SIZE = 50000
+
+# Value domains used by the synthetic generator (same as the 10K base data)
+CUSTOMERS = ['Boo', 'Chae', 'Claire', 'Dan', 'Emily', 'Helen', 'Mia', 'Sam', 'Wally']
+PRODUCTS = ['Apple', 'Butter', 'Cherry', 'Dates', 'Eggs', 'Fish', 'Grapes', 'Ham', 'Ice', 'Jelly']
+STATES = ['CT', 'NJ', 'NY', 'PA']
+YEARS = [2016, 2017, 2018, 2019, 2020]
+
+INSERT_PATTERN = re.compile(r"^\s*insert\s+into\s+sales\s+values\s*\((.*)\)\s*;\s*$", re.IGNORECASE)
+
+
+def _make_row(cust, prod, day, month, year, state, quant):
+    """Build a sales row tuple, deriving the date column from day/month/year"""
+    return (cust, prod, day, month, year, state, quant, date(year, month, day).isoformat())
+
+
+def read_csv_rows(file_path):
+    """
+    Stream sales rows from a CSV file
+
+    Parameters:
+    - file_path: path to a CSV file with the sales columns in table order.
+      A header row is skipped if its first field is 'cust'.
+    """
+    with open(file_path, 'r', newline='') as f:
+        for record in csv.reader(f):
+            if not record or record[0].strip().lower() == 'cust':
+                continue
+            yield tuple(value.strip() for value in record)
+
+
+def read_sql_script_rows(file_path=DEFAULT_SQL_SCRIPT):
+    """
+    Stream sales rows out of an INSERT script such as the 10K load script
+
+    Parameters:
+    - file_path: path to a script of "insert into sales values (...);" lines
+    """
+    with open(file_path, 'r') as f:
+        for line in f:
+            match = INSERT_PATTERN.match(line)
+            if not match:
+                continue
+            # SQL literals are comma separated with single-quoted strings
+            values = next(csv.reader([match.group(1)], quotechar="'", skipinitialspace=True))
+            yield tuple(value.strip() for value in values)
+
+
+def generate_rows(num_rows, seed=None):
+    """
+    Generate synthetic sales rows with the same value domains as the base data
+
+    Parameters:
+    - num_rows: number of rows to generate
+    - seed: optional random seed for reproducible datasets
+    """
+    rng = random.Random(seed)
+    for _ in range(num_rows):
+        year = rng.choice(YEARS)
+        month = rng.randint(1, 12)
+        day = rng.randint(1, 28)
+        yield _make_row(rng.choice(CUSTOMERS), rng.choice(PRODUCTS), day, month, year,
+                        rng.choice(STATES), rng.randint(1, 1000))
+
+
+def scale_rows(read_rows, scale_factor, perturb=False, seed=None):
+    """
+    Replicate base rows into a dataset scale_factor times larger
+
+    The base rows are streamed again for every copy instead of being held
+    in memory, so large sources can be scaled.
+
+    Parameters:
+    - read_rows: function with no arguments returning a fresh iterable of
+      the base rows (e.g. functools.partial(read_csv_rows, path)); called
+      once per copy
+    - scale_factor: number of copies of the base rows to produce
+    - perturb: if True, every copy after the first gets a jittered quant
+      and day (the date column is kept consistent with day/month/year)
+    - seed: optional random seed used when perturbing
+    """
+    rng = random.Random(seed)
+    for copy_number in range(scale_factor):
+        for row in read_rows():
+            if not perturb or copy_number == 0:
+                yield row
+                continue
+            cust, prod, day, month, year, state, quant = row[:7]
+            quant = max(1, int(quant) + rng.randint(-int(quant) // 10, int(quant) // 10))
+            day = rng.randint(1, 28)
+            yield _make_row(cust, prod, day, int(month), int(year), state, quant)
+
+
+def _rows_to_csv_buffer(rows):
+    """Serialize a batch of rows into an in-memory CSV buffer for COPY"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    buffer.seek(0)
+    return buffer
+
+
+def copy_rows(conn, rows, batch_size=DEFAULT_BATCH_SIZE, truncate=False):
+    """
+    Load rows into the sales table using COPY in large batches
+
+    Parameters:
+    - conn: open psycopg2 connection
+    - rows: iterable of sales tuples in SALES_COLUMNS order
+    - batch_size: number of rows sent per COPY statement
+    - truncate: empty the sales table before loading
+
+    Returns the number of rows loaded.
+    """
+    copy_sql = f"COPY sales ({', '.join(SALES_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    cur = conn.cursor()
+    if truncate:
+        cur.execute("TRUNCATE TABLE sales")
+
+    total = 0
+    batch = []
+    start = time.perf_counter()
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cur.copy_expert(copy_sql, _rows_to_csv_buffer(batch))
+            total += len(batch)
+            batch = []
+            elapsed = time.perf_counter() - start
+            print(f"Loaded {total} rows ({total / elapsed:,.0f} rows/sec)")
+    if batch:
+        cur.copy_expert(copy_sql, _rows_to_csv_buffer(batch))
+        total += len(batch)
+
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float('inf')
+    print(f"Finished: {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return total
+
+
+def main(argv=None):
+    """Command line entry point for bulk loading the sales table"""
+    parser = argparse.ArgumentParser(description="Bulk load the sales table using COPY")
+    parser.add_argument('source', choices=['sql', 'csv', 'synthetic'],
+                        help="where rows come from")
+    parser.add_argument('--file', help="input file for the sql or csv source")
+    parser.add_argument('--rows', type=int, default=10000,
+                        help="number of rows for the synthetic source")
+    parser.add_argument('--scale', type=int, default=1,
+                        help="replicate the sql or csv source rows this many times")
+    parser.add_argument('--perturb', action='store_true',
+                        help="jitter quant/day in replicated rows")
+    parser.add_argument('--seed', type=int, help="random seed for synthetic/perturbed rows")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per COPY batch")
+    parser.add_argument('--truncate', action='store_true',
+                        help="truncate the sales table before loading")
+    args = parser.parse_args(argv)
+
+    if args.scale < 1:
+        parser.error("--scale must be at least 1")
+    if args.source == 'sql':
+        read_rows = functools.partial(read_sql_script_rows, args.file or DEFAULT_SQL_SCRIPT)
+    elif args.source == 'csv':
+        if not args.file:
+            parser.error("--file is required for the csv source")
+        read_rows = functools.partial(read_csv_rows, args.file)
+    else:
+        # Synthetic rows are not re-read per copy; generate more of them instead
+        if args.scale > 1:
+            parser.error("--scale is not supported for the synthetic source, use --rows")
+        read_rows = functools.partial(generate_rows, args.rows, seed=args.seed)
+
+    if args.scale > 1:
+        rows = scale_rows(read_rows, args.scale, perturb=args.perturb, seed=args.seed)
+    else:
+        rows = read_rows()
+
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect to database!")
+        return
+
+    try:
+        copy_rows(conn, rows, batch_size=args.batch_size, truncate=args.truncate)
+    except Exception as e:
+        conn.rollback()
+        print(f"Error loading rows: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
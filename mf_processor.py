@@ -1,5 +1,67 @@
+import itertools
+import math
+import operator
+import random
+import re
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from statistics import NormalDist
+
+import psycopg2.extensions
+
+# Comparison operators supported in conditions (longest first for parsing)
+OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '!=': operator.ne,
+    '=': operator.eq,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+
+# Map of PostgreSQL catalog data types to the short names used in MFStructure.schema
+CATALOG_TYPES = {
+    'character varying': 'varchar',
+    'text': 'varchar',
+    'character': 'char',
+    'integer': 'integer',
+    'smallint': 'integer',
+    'bigint': 'integer',
+    'numeric': 'numeric',
+    'real': 'float',
+    'double precision': 'float',
+    'date': 'date',
+    'timestamp without time zone': 'timestamp',
+    'boolean': 'boolean',
+}
+
+# Operator symbol for each comparison function (used when printing plans and pushing down predicates)
+OPERATOR_NAMES = {compare: op for op, compare in OPERATORS.items()}
+
+# Relative cost of evaluating one comparison, by column type
+PREDICATE_COSTS = {
+    'integer': 1.0,
+    'float': 1.0,
+    'boolean': 1.0,
+    'numeric': 1.5,
+    'date': 1.5,
+    'timestamp': 1.5,
+    'char': 2.0,
+    'varchar': 2.0,
+}
+
+# Selectivity guesses for columns without statistics
+DEFAULT_SELECTIVITY = {
+    '=': 0.1,
+    '!=': 0.9,
+}
+DEFAULT_RANGE_SELECTIVITY = 1 / 3
+
+
 class MFStructure:
-    def __init__(self, select_attrs, grouping_vars, grouping_attrs, f_vect, conditions, having):
+    def __init__(self, select_attrs, grouping_vars, grouping_attrs, f_vect, conditions, having,
+                 grouping_sets='-'):
         """
         Initialize MF Structure with Phi operation parameters
         
@@ -10,6 +72,8 @@ class MFStructure:
         - f_vect: comma-separated string of aggregate functions
         - conditions: semicolon-separated string of conditions for each grouping variable
         - having: having clause condition (or '-' if none)
+        - grouping_sets: ROLLUP, CUBE, explicit sets of grouping attributes such as
+          "(cust, prod), (cust), ()", or '-' to group by grouping_attrs only
         """
         self.select_attrs = [attr.strip() for attr in select_attrs.split(',')]
         self.num_grouping_vars = int(grouping_vars)
@@ -17,7 +81,10 @@ class MFStructure:
         self.f_vect = [f.strip() for f in f_vect.split(',')]
         self.conditions = [cond.strip() for cond in conditions.split(';')]
         self.having = having
+        self.grouping_sets = self._parse_grouping_sets(grouping_sets)
         self.mf_struct = {}
+        # Groups matched by the first grouping variable (the groups of the result)
+        self.seeded = set()
         
         # Map of column names to their PostgreSQL data types
         self.schema = {
@@ -30,7 +97,71 @@ class MFStructure:
             'quant': 'integer',
             'date': 'date'
         }
+        # Positional layout of the sales table, filled from the catalog by load_schema()
+        self.columns = []
+        self.column_index = {}
+        self.char_lengths = {}
+        # Column statistics from collect_statistics() and actuals of the last scan
+        self.stats = None
+        self.last_run = None
+        # Fraction of the table scanned in approximate mode (None for exact results)
+        self.sample_rate = None
+        self.confidence = 0.95
+        self.uncertain_rejections = 0
     
+    def _parse_grouping_sets(self, grouping_sets):
+        """
+        Expand a grouping sets specification into a list of attribute tuples
+
+        Parameters:
+        - grouping_sets: ROLLUP or CUBE (over all grouping attributes),
+          ROLLUP(...) or CUBE(...) over a list of grouping attributes,
+          explicit sets (e.g. "(cust, prod), (cust), ()") or '-' for none
+
+        Returns None when no grouping sets are requested. Each set is listed
+        once, with its attributes in grouping attribute order. Raises
+        ValueError for anything that is not one of the forms above.
+        """
+        if not grouping_sets or grouping_sets.strip() == '-':
+            return None
+
+        spec = grouping_sets.strip()
+        operator_match = re.fullmatch(r'(ROLLUP|CUBE)\s*(?:\(([^()]*)\))?', spec, re.IGNORECASE)
+        if operator_match:
+            if operator_match.group(2) is None:
+                args = tuple(self.grouping_attrs)
+            else:
+                args = self._parse_attribute_list(operator_match.group(2))
+                if not args:
+                    raise ValueError(f"{operator_match.group(1).upper()} needs at least one attribute")
+            if operator_match.group(1).upper() == 'ROLLUP':
+                levels = [args[:i] for i in range(len(args), -1, -1)]
+            else:
+                levels = [subset for size in range(len(args), -1, -1)
+                          for subset in itertools.combinations(args, size)]
+        elif re.fullmatch(r'\([^()]*\)(\s*,\s*\([^()]*\))*', spec):
+            levels = [self._parse_attribute_list(group) for group in re.findall(r'\(([^()]*)\)', spec)]
+        else:
+            raise ValueError(f"Invalid grouping sets specification: {grouping_sets}")
+
+        sets = []
+        for level in levels:
+            # Keep the grouping attribute order so keys can be projected from the finest level
+            level = tuple(attr for attr in self.grouping_attrs if attr in level)
+            if level not in sets:
+                sets.append(level)
+        return sets
+
+    def _parse_attribute_list(self, text):
+        """Parse a comma-separated list of grouping attributes inside a grouping set"""
+        attrs = tuple(attr.strip() for attr in text.split(',')) if text.strip() else ()
+        for attr in attrs:
+            if attr not in self.grouping_attrs:
+                raise ValueError(f"Grouping set attribute '{attr}' is not a grouping attribute")
+        if len(set(attrs)) != len(attrs):
+            raise ValueError(f"Repeated attribute in grouping set ({text})")
+        return attrs
+
     def process_tuple(self, tuple_data, scan_number):
         """
         Process a single tuple for a specific scan number
@@ -86,6 +217,10 @@ class MFStructure:
                 aggregates[f + '_sum'] = 0
                 aggregates[f + '_count'] = 0
 
+            # Approximate mode needs sums of squares for the confidence intervals
+            if self.sample_rate and ('sum_' in f or 'avg_' in f):
+                aggregates[f + '_sumsq'] = 0
+
         return aggregates
     
     def _check_condition(self, tuple_data, condition):
@@ -197,36 +332,51 @@ class MFStructure:
         if not self.having or self.having == '-':
             return
             
-        filtered_struct = {}
-        for group_key, entry in self.mf_struct.items():
-            # Compute averages before evaluation
-            for f in self.f_vect:
-                if '_avg_' in f:
-                    if entry[f + '_count'] > 0:
-                        entry[f] = entry[f + '_sum'] / entry[f + '_count']
-                    else:
-                        entry[f] = 0
-                        
-            # Evaluate having condition
-            if self._evaluate_having_condition(entry):
-                filtered_struct[group_key] = entry
-                
-        self.mf_struct = filtered_struct
+        self.uncertain_rejections = 0
+        self.mf_struct = {group_key: entry for group_key, entry in self.mf_struct.items()
+                          if self._passes_having(entry)}
+        if self.sample_rate:
+            print(f"Groups excluded by an uncertain having decision: {self.uncertain_rejections}")
+
+    def _passes_having(self, entry):
+        """Compute averages of a group and check it against the having clause"""
+        if not self.having or self.having == '-':
+            return True
+
+        for f in self.f_vect:
+            if '_avg_' in f:
+                if entry[f + '_count'] > 0:
+                    entry[f] = entry[f + '_sum'] / entry[f + '_count']
+                else:
+                    entry[f] = 0
+
+        if self._evaluate_having_condition(entry):
+            if self.sample_rate:
+                entry['having_uncertain'] = self._having_uncertain(entry, True)
+            return True
+        if self.sample_rate and self._having_uncertain(entry, False):
+            self.uncertain_rejections += 1
+        return False
     
-    def _evaluate_having_condition(self, entry):
-        """Evaluate having condition for a group"""
+    def _evaluate_having_condition(self, entry, overrides=None):
+        """
+        Evaluate having condition for a group
+
+        Parameters:
+        - entry: MF structure entry of the group
+        - overrides: optional dictionary of aggregate values to use instead of the entry's
+        """
         if not self.having or self.having == '-':
             return True
             
         try:
-            # Import math to use math.inf
-            import math
-            
             # Replace aggregate function references with actual values
             condition = self.having
             for f in self.f_vect:
                 if f in condition:
-                    if '_avg_' in f:
+                    if overrides and f in overrides:
+                        value = overrides[f]
+                    elif '_avg_' in f:
                         if entry.get(f + '_count', 0) > 0:
                             value = entry[f + '_sum'] / entry[f + '_count']
                         else:
@@ -235,56 +385,718 @@ class MFStructure:
                         value = entry.get(f, 0)
                     condition = condition.replace(f, str(value))
             
-            return eval(condition)
+            # min/max over no rows (and interval bounds) can be infinite
+            return eval(condition, {'inf': math.inf})
         except Exception as e:
             print(f"Error in having condition evaluation: {e}")
             return True
     
-    def get_results(self):
-        """Get final results in tabular format"""
-        results = []
-        for group_key, entry in self.mf_struct.items():
-            row = {}
-            # Add grouping attributes
-            for attr in self.grouping_attrs:
-                row[attr] = entry.get(attr, None)
-            
-            # Add aggregate values
-            for attr in self.select_attrs:
-                if attr in self.grouping_attrs:
-                    continue
-                if '_avg_' in attr:
-                    count_key = attr + '_count'
-                    sum_key = attr + '_sum'
-                    if entry.get(count_key, 0) > 0:
-                        row[attr] = round(entry[sum_key] / entry[count_key], 2)
+    def _having_uncertain(self, entry, decision):
+        """
+        Check whether a HAVING decision could flip within the confidence intervals
+
+        The condition is re-evaluated at every combination of interval
+        endpoints of the aggregates it references; this is exact for
+        conditions that are monotone in each aggregate (e.g. linear comparisons).
+        A referenced aggregate without an interval (no sampled values) makes
+        the decision uncertain. A sampled min or max only bounds the true
+        value from one side (true min <= sample min, true max >= sample max),
+        so its range is unbounded on the other side.
+        """
+        bounds = []
+        for f in self.f_vect:
+            if f not in self.having:
+                continue
+            if self.sample_rate < 1 and ('min_' in f or 'max_' in f):
+                bounds.append([(f, entry.get(f)), (f, -math.inf if 'min_' in f else math.inf)])
+                continue
+            if f + '_ci' not in entry:
+                continue
+            half_width = entry[f + '_ci']
+            if half_width is None:
+                return True
+            if half_width:
+                value = self._aggregate_value(entry, f)
+                bounds.append([(f, value - half_width), (f, value + half_width)])
+        for corner in itertools.product(*bounds):
+            if bool(self._evaluate_having_condition(entry, dict(corner))) != decision:
+                return True
+        return False
+
+    def _aggregate_value(self, entry, f):
+        """Current value of an aggregate, computing averages from their sum and count"""
+        if '_avg_' in f:
+            count = entry.get(f + '_count', 0)
+            return entry[f + '_sum'] / count if count > 0 else 0
+        return entry.get(f, 0)
+
+    def _scale_estimates(self):
+        """
+        Scale sampled aggregates up to the full table and attach confidence intervals
+
+        count and sum are divided by the sample rate; avg is a ratio and is
+        left as is; min and max are reported from the sample without an
+        interval. Half widths of the intervals are stored as '<aggregate>_ci'.
+        Variances assume each row is sampled independently, which understates
+        them somewhat for block sampling.
+
+        A count of zero in the sample gets the rule-of-three style bound
+        -ln(1 - confidence) / rate (about 3 / rate at 95%). Sums and averages
+        without sampled values have no interval (None), which makes HAVING
+        decisions on them uncertain.
+        """
+        p = self.sample_rate
+        z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+        zero_count_bound = -math.log(1 - self.confidence) / p if p < 1 else 0.0
+        for entry in self.mf_struct.values():
+            for f in self.f_vect:
+                if 'count_' in f:
+                    n = entry[f]
+                    entry[f] = n / p
+                    if n == 0:
+                        entry[f + '_ci'] = zero_count_bound
+                    else:
+                        entry[f + '_ci'] = z * math.sqrt(n * (1 - p)) / p
+                elif 'sum_' in f:
+                    entry[f] = entry[f] / p
+                    if entry[f + '_sumsq'] == 0 and p < 1:
+                        entry[f + '_ci'] = None
+                    else:
+                        entry[f + '_ci'] = z * math.sqrt(entry[f + '_sumsq'] * (1 - p)) / p
+                elif 'avg_' in f:
+                    n = entry[f + '_count']
+                    if n > 1:
+                        mean = entry[f + '_sum'] / n
+                        variance = max(0.0, (entry[f + '_sumsq'] - n * mean * mean) / (n - 1))
+                        entry[f + '_ci'] = z * math.sqrt(variance * (1 - p) / n)
                     else:
-                        row[attr] = 0
+                        entry[f + '_ci'] = None
+
+    def output_columns(self):
+        """Names of the columns of each result row, in output order"""
+        columns = list(self.grouping_attrs)
+        for attr in self.select_attrs:
+            if attr in self.grouping_attrs:
+                continue
+            columns.append(attr)
+            if self.sample_rate:
+                columns.append(attr + '_ci')
+        if self.sample_rate and self.having and self.having != '-':
+            columns.append('having_uncertain')
+        return columns
+
+    def _result_row(self, entry):
+        """Build the output row of a group"""
+        row = {}
+        # Add grouping attributes
+        for attr in self.grouping_attrs:
+            row[attr] = entry.get(attr, None)
+        
+        # Add aggregate values
+        for attr in self.select_attrs:
+            if attr in self.grouping_attrs:
+                continue
+            if '_avg_' in attr:
+                count_key = attr + '_count'
+                sum_key = attr + '_sum'
+                if entry.get(count_key, 0) > 0:
+                    row[attr] = round(entry[sum_key] / entry[count_key], 2)
                 else:
-                    row[attr] = entry.get(attr, 0)
-            results.append(row)
+                    row[attr] = 0
+            else:
+                row[attr] = entry.get(attr, 0)
+            if self.sample_rate:
+                if attr in self.f_vect and ('count_' in attr or 'sum_' in attr):
+                    row[attr] = round(row[attr], 2)
+                half_width = entry.get(attr + '_ci')
+                row[attr + '_ci'] = round(half_width, 2) if half_width is not None else None
+        if self.sample_rate and self.having and self.having != '-':
+            row['having_uncertain'] = entry.get('having_uncertain', False)
+        return row
+
+    def _sort_key(self, values):
+        """Sort key for a group; rolled-up attributes (None) sort after the values they summarise"""
+        return [(values.get(attr) is None, str(values.get(attr, ''))) for attr in self.grouping_attrs]
+
+    def get_results(self):
+        """Get final results in tabular format"""
+        results = [self._result_row(entry) for entry in self.mf_struct.values()]
         
         # Sort results by grouping attributes
-        return sorted(results, key=lambda x: [str(x.get(attr, '')) for attr in self.grouping_attrs])
+        return sorted(results, key=self._sort_key)
+
+    def emit_results(self, sink):
+        """
+        Stream finalized groups to a result sink as the having clause is evaluated
+
+        Groups are written in the same order as get_results(), but only the
+        group entries are sorted, so no list of result rows is built.
+
+        Parameters:
+        - sink: object with open(columns) and write(row) methods, such as the
+          sinks in sinks.py; it is opened with output_columns() before any row
 
-    def process_all_scans(self, cursor):
-        """Process all scans according to EMF algorithm 3.1"""
+        Returns the number of rows written.
+        """
+        sink.open(self.output_columns())
+        self.uncertain_rejections = 0
+        count = 0
+        for entry in sorted(self.mf_struct.values(), key=self._sort_key):
+            if self._passes_having(entry):
+                sink.write(self._result_row(entry))
+                count += 1
+        if self.sample_rate:
+            print(f"Groups excluded by an uncertain having decision: {self.uncertain_rejections}")
+        return count
+
+    def load_schema(self, cursor, table='sales'):
+        """
+        Read column names and types of the table from the database catalog
+
+        Columns of types missing from CATALOG_TYPES keep their catalog type
+        name; conditions on them are rejected by _convert_literal().
+
+        Parameters:
+        - cursor: database cursor
+        - table: name of the table to introspect (in the current schema)
+        """
+        cursor.execute(
+            "SELECT column_name, data_type, character_maximum_length "
+            "FROM information_schema.columns "
+            "WHERE table_name = %s AND table_schema = current_schema() "
+            "ORDER BY ordinal_position",
+            (table,)
+        )
+        self.columns = []
+        self.char_lengths = {}
+        for column_name, data_type, max_length in cursor.fetchall():
+            self.columns.append(column_name)
+            self.schema[column_name] = CATALOG_TYPES.get(data_type, data_type)
+            if data_type == 'character' and max_length:
+                self.char_lengths[column_name] = max_length
+        if not self.columns:
+            raise ValueError(f"Table {table} not found in the current schema")
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+
+    def _convert_literal(self, field, value):
+        """Convert a condition literal to the native type of the column"""
+        col_type = self.schema[field]
+        if col_type == 'integer':
+            return int(value)
+        if col_type == 'numeric':
+            return Decimal(value)
+        if col_type == 'float':
+            return float(value)
+        if col_type == 'date':
+            return date.fromisoformat(value)
+        if col_type == 'timestamp':
+            return datetime.fromisoformat(value)
+        if col_type == 'boolean':
+            if value.lower() not in ('true', 'false'):
+                raise ValueError(f"Invalid boolean literal for {field}: {value}")
+            return value.lower() == 'true'
+        if col_type == 'char' and field in self.char_lengths:
+            # char(n) values come back blank-padded from the database
+            return value.ljust(self.char_lengths[field])
+        if col_type in ('varchar', 'char'):
+            return value
+        raise ValueError(f"Unsupported column type {col_type} for {field}")
+
+    def _compile_condition(self, condition):
+        """
+        Bind a condition to positional column indices and typed literals
+
+        Parameters:
+        - condition: Condition string (e.g., "state='NY' and year=2023")
+
+        Returns a list of (column index, comparison function, value) tuples
+        that must all hold. Raises ValueError if the condition cannot be
+        bound (bad syntax, unknown column, invalid literal, or a reference to
+        an aggregate, which the engine does not support).
+        """
+        if not condition or condition == '-':
+            return []
+
+        predicates = []
+        for sub_condition in [cond.strip() for cond in condition.split(' and ')]:
+            for op, compare in OPERATORS.items():
+                if op in sub_condition:
+                    parts = sub_condition.split(op)
+                    if len(parts) != 2:
+                        raise ValueError(f"Invalid condition format: {sub_condition}")
+                    field_expr, value_expr = parts
+                    field = field_expr.split('.')[-1].strip()
+                    value = value_expr.strip().strip("'").strip()
+                    if field not in self.column_index:
+                        raise ValueError(f"Unknown column '{field}' in condition: {sub_condition}")
+                    if value in self.f_vect:
+                        raise ValueError(f"Conditions referencing aggregates are not supported: {sub_condition}")
+                    try:
+                        literal = self._convert_literal(field, value)
+                    except ValueError as e:
+                        raise ValueError(f"Invalid value in condition {sub_condition}: {e}") from e
+                    predicates.append((self.column_index[field], compare, literal))
+                    break
+            else:
+                raise ValueError(f"No valid operator found in condition: {sub_condition}")
+
+        return predicates
+
+    def _compile_aggregates(self, scan_number):
+        """Bind the aggregates updated by a scan to positional column indices"""
+        scan_prefix = f"{scan_number + 1}_"
+        aggregates = []
+        for f in self.f_vect:
+            if not f.startswith(scan_prefix):
+                continue
+            agg_parts = f.split('_')
+            if len(agg_parts) >= 3:
+                field = '_'.join(agg_parts[2:])
+                aggregates.append((f, agg_parts[1], self.column_index[field]))
+                if self.sample_rate and agg_parts[1] in ('sum', 'avg'):
+                    aggregates.append((f + '_sumsq', 'sumsq', self.column_index[field]))
+        return aggregates
+
+    def collect_statistics(self, cursor, table='sales'):
+        """
+        Read the row count and column statistics of the table from the catalog
+
+        The estimates come from pg_class and pg_stats (kept up to date by
+        ANALYZE), so no pass over the table is needed: for each column the
+        fraction of NULLs, the number of distinct values, the most common
+        values with their frequencies and the histogram bounds of the
+        remaining values.
+
+        Parameters:
+        - cursor: database cursor
+        - table: name of the table (in the current schema)
+        """
+        if not self.columns:
+            self.load_schema(cursor, table)
+        cursor.execute("SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+        result = cursor.fetchall()
+        # reltuples is -1 for tables that were never analyzed
+        row_count = max(0, int(result[0][0])) if result and result[0][0] is not None else 0
+
+        # anyarray columns are cast to text[] so values arrive as literals to convert
+        cursor.execute(
+            "SELECT attname, null_frac, n_distinct, most_common_vals::text::text[], "
+            "most_common_freqs, histogram_bounds::text::text[] "
+            "FROM pg_stats WHERE schemaname = current_schema() AND tablename = %s",
+            (table,)
+        )
+        columns = {}
+        for name, null_frac, n_distinct, common_values, common_freqs, bounds in cursor.fetchall():
+            if name not in self.column_index:
+                continue
+            try:
+                mcv = {self._convert_literal(name, value): freq
+                       for value, freq in zip(common_values or [], common_freqs or [])}
+                histogram = [self._convert_literal(name, value) for value in bounds or []]
+            except ValueError:
+                continue
+            columns[name] = {
+                'null_frac': null_frac,
+                # A negative n_distinct is minus the fraction of rows that are distinct
+                'n_distinct': n_distinct if n_distinct >= 0 else -n_distinct * row_count,
+                'mcv': mcv,
+                'histogram': histogram,
+            }
+        if not columns:
+            print(f"No statistics for {table}, run ANALYZE {table} to improve predicate ordering")
+
+        self.stats = {'row_count': row_count, 'columns': columns}
+        return self.stats
+
+    def _estimate_selectivity(self, predicate):
+        """
+        Estimate the fraction of rows satisfying a single (index, compare, value) predicate
+
+        Most common values are matched directly. Other values share the
+        remaining non-NULL rows: evenly among the other distinct values for
+        equality, and by the fraction of histogram bounds satisfying a range
+        comparison.
+        """
+        i, compare, value = predicate
+        op = OPERATOR_NAMES[compare]
+        column = self.stats['columns'].get(self.columns[i]) if self.stats else None
+        if column is None:
+            return DEFAULT_SELECTIVITY.get(op, DEFAULT_RANGE_SELECTIVITY)
+
+        mcv = column['mcv']
+        rest = max(0.0, 1.0 - column['null_frac'] - sum(mcv.values()))
+        if op in ('=', '!='):
+            if value in mcv:
+                equal = mcv[value]
+            else:
+                other_values = column['n_distinct'] - len(mcv)
+                equal = rest / other_values if other_values > 0 else 0.0
+            return equal if op == '=' else max(0.0, 1.0 - column['null_frac'] - equal)
+
+        matching = sum(freq for v, freq in mcv.items() if compare(v, value))
+        bounds = column['histogram']
+        if bounds:
+            matching += rest * sum(1 for bound in bounds if compare(bound, value)) / len(bounds)
+        else:
+            matching += rest * DEFAULT_RANGE_SELECTIVITY
+        return matching
+
+    def _predicate_cost(self, predicate):
+        """Relative cost of evaluating a predicate, based on its column type"""
+        return PREDICATE_COSTS.get(self.schema[self.columns[predicate[0]]], 1.0)
+
+    def _order_predicates(self, predicates):
+        """
+        Order an 'and' chain so cheap and selective predicates are checked first
+
+        Predicates are sorted by rank (selectivity - 1) / cost, which minimises
+        the expected cost of evaluating the chain with short-circuiting.
+        """
+        return sorted(
+            predicates,
+            key=lambda p: (self._estimate_selectivity(p) - 1) / self._predicate_cost(p)
+        )
+
+    def _chain_estimates(self, predicates):
+        """Return (selectivity, expected cost per row) of an ordered 'and' chain"""
+        selectivity = 1.0
+        cost = 0.0
+        for predicate in predicates:
+            cost += selectivity * self._predicate_cost(predicate)
+            selectivity *= self._estimate_selectivity(predicate)
+        return selectivity, cost
+
+    def plan_scans(self, cursor):
+        """
+        Build the scan plan for the query
+
+        Conditions only reference columns of the current tuple, so all
+        grouping variables share a single pass over the table. The
+        disjunction of their conditions is pushed down to the database as a
+        WHERE clause.
+
+        Parameters:
+        - cursor: database cursor (used to read the schema and statistics)
+
+        Returns a dictionary with the scans of the pass (scan number, ordered
+        predicates, aggregates), the pushed-down WHERE clause and its parameters.
+        Raises ValueError if a condition cannot be bound.
+        """
+        if not self.columns:
+            self.load_schema(cursor)
+
+        conditions = self.conditions[:self.num_grouping_vars]
+        if len(conditions) != self.num_grouping_vars:
+            raise ValueError(f"Expected {self.num_grouping_vars} conditions, got {len(conditions)}")
+        compiled = [self._compile_condition(cond) for cond in conditions]
+        if self.stats is None and any(len(preds) > 1 for preds in compiled):
+            self.collect_statistics(cursor)
+
+        scans = [(scan, self._order_predicates(predicates), self._compile_aggregates(scan))
+                 for scan, predicates in enumerate(compiled)]
+
+        # Push the disjunction of the scan conditions down to the database
+        where = None
+        params = []
+        if all(predicates for _, predicates, _ in scans):
+            clauses = []
+            for _, predicates, _ in scans:
+                terms = []
+                for i, compare, value in predicates:
+                    terms.append(f"{self.columns[i]} {OPERATOR_NAMES[compare]} %s")
+                    params.append(value)
+                clauses.append(f"({' AND '.join(terms)})")
+            where = ' OR '.join(clauses)
+
+        return {'scans': scans, 'where': where, 'params': params}
+
+    def _bind_predicates(self, predicates):
+        """
+        Build a function checking an ordered 'and' chain against a row
+
+        The chain is unrolled into nested closures so checking a row does not
+        allocate (no generator per row). A NULL column fails any comparison,
+        as in SQL. Returns None for an empty chain, which every row satisfies.
+        """
+        check = None
+        for i, compare, value in reversed(predicates):
+            check = self._bind_predicate(i, compare, value, check)
+        return check
+
+    @staticmethod
+    def _bind_predicate(i, compare, value, rest):
+        """Bind one comparison, followed by the rest of the chain if any"""
+        if rest is None:
+            def check(row):
+                column = row[i]
+                return column is not None and compare(column, value)
+        else:
+            def check(row):
+                column = row[i]
+                return column is not None and compare(column, value) and rest(row)
+        return check
+
+    def _scan(self, rows, scans):
+        """
+        Run the scan over positional rows, updating the MF structure
+
+        Parameters:
+        - rows: iterable of row tuples in self.columns order
+        - scans: list of (scan number, ordered predicates, aggregates) for every grouping variable
+
+        Returns a (total rows, matched rows per scan) tuple.
+        """
+        mf_struct = self.mf_struct
+        seeded = self.seeded
+        # A single grouping attribute keys groups by its value, several by a tuple
+        get_key = operator.itemgetter(*[self.column_index[attr] for attr in self.grouping_attrs])
+        multi_key = len(self.grouping_attrs) > 1
+        # Groups belong to the result if the first grouping variable matches
+        # them; entries created by other variables are dropped by
+        # _prune_groups() unless it matches too. Grouping sets need every
+        # finest group until then, since coarser groups may be seeded through
+        # a different finest group.
+        bound = [(n, self._bind_predicates(predicates), scan_number, aggregates)
+                 for n, (scan_number, predicates, aggregates) in enumerate(scans)]
+        count_total = 0
+        count_matched = [0] * len(scans)
+
+        for row in rows:
+            count_total += 1
+            group_key = get_key(row)
+            for n, check, scan_number, aggregates in bound:
+                if check is not None and not check(row):
+                    continue
+                count_matched[n] += 1
+
+                entry = mf_struct.get(group_key)
+                if entry is None:
+                    entry = mf_struct[group_key] = self._initialize_aggregates()
+                    if multi_key:
+                        entry.update(zip(self.grouping_attrs, group_key))
+                    else:
+                        entry[self.grouping_attrs[0]] = group_key
+                if scan_number == 0:
+                    seeded.add(group_key)
+
+                for f, agg_type, i in aggregates:
+                    # Aggregates ignore NULL values, as in SQL
+                    if row[i] is None:
+                        continue
+                    if agg_type == 'sum':
+                        entry[f] += row[i]
+                    elif agg_type == 'count':
+                        entry[f] += 1
+                    elif agg_type == 'max':
+                        if row[i] > entry[f]:
+                            entry[f] = row[i]
+                    elif agg_type == 'min':
+                        if row[i] < entry[f]:
+                            entry[f] = row[i]
+                    elif agg_type == 'avg':
+                        entry[f + '_sum'] += row[i]
+                        entry[f + '_count'] += 1
+                    elif agg_type == 'sumsq':
+                        entry[f] += row[i] * row[i]
+
+        return count_total, count_matched
+
+    def _merge_entry(self, target, entry):
+        """Merge the aggregate state of one group into another"""
+        for f in self.f_vect:
+            if 'count_' in f or 'sum_' in f:
+                target[f] += entry[f]
+            elif 'max_' in f:
+                target[f] = max(target[f], entry[f])
+            elif 'min_' in f:
+                target[f] = min(target[f], entry[f])
+            elif 'avg_' in f:
+                target[f + '_sum'] += entry[f + '_sum']
+                target[f + '_count'] += entry[f + '_count']
+            if f + '_sumsq' in entry:
+                target[f + '_sumsq'] += entry[f + '_sumsq']
+
+    def _compute_grouping_sets(self):
+        """
+        Derive the coarser grouping sets from the finest level groups
+
+        Aggregate states (sum/count/min/max and avg's sum and count) of the
+        finest groups are merged in memory, so no extra scans are needed. A
+        coarser group is part of the result if any of its finest groups is.
+        """
+        finest = tuple(self.grouping_attrs)
+        coarse_struct = {}
+        for level in self.grouping_sets:
+            if level == finest:
+                continue
+            positions = [finest.index(attr) for attr in level]
+            for group_key, entry in self.mf_struct.items():
+                key = group_key if len(finest) > 1 else (group_key,)
+                coarse_key = (level,) + tuple(key[p] for p in positions)
+                target = coarse_struct.get(coarse_key)
+                if target is None:
+                    target = coarse_struct[coarse_key] = self._initialize_aggregates()
+                    for attr in level:
+                        target[attr] = entry[attr]
+                self._merge_entry(target, entry)
+                if group_key in self.seeded:
+                    self.seeded.add(coarse_key)
+
+        if finest not in self.grouping_sets:
+            self.mf_struct = {}
+        self.mf_struct.update(coarse_struct)
+
+    def _prune_groups(self):
+        """Drop groups the first grouping variable never matched"""
+        self.mf_struct = {key: entry for key, entry in self.mf_struct.items() if key in self.seeded}
+
+    def process_all_scans(self, cursor, sample_rate=None, confidence=0.95, seed=None, sink=None):
+        """
+        Process all scans according to EMF algorithm 3.1
+
+        Parameters:
+        - cursor: database cursor
+        - sample_rate: fraction of the table to scan (0 < rate <= 1) for
+          approximate results, or None for exact results. Rows are read with
+          TABLESAMPLE SYSTEM, count and sum are scaled up, each aggregate gets
+          an '<aggregate>_ci' half width and HAVING decisions a
+          'having_uncertain' flag.
+        - confidence: confidence level of the intervals in approximate mode
+        - seed: seed for the block sample (random if None), for repeatable samples
+        - sink: optional result sink; when given, finalized groups are streamed
+          to it and the number of rows written is returned instead of a list
+        """
         print("\nProcessing all scans...")
-        
-        for scan in range(self.num_grouping_vars):
-            print(f"\nStarting scan {scan + 1} with condition: {self.conditions[scan]}")
-            cursor.execute("SELECT * FROM sales")
-            count_total = 0
-            count_matched = 0
-            for row in cursor:
-                count_total += 1
-                if self._check_condition(dict(row), self.conditions[scan]):
-                    self.process_tuple(dict(row), scan)
-                    count_matched += 1
-            print(f"Total rows: {count_total}, Matched rows: {count_matched}")
-        
+        if sample_rate is not None and not 0 < sample_rate <= 1:
+            raise ValueError(f"Sample rate must be in (0, 1], got {sample_rate}")
+        self.sample_rate = sample_rate
+        self.confidence = confidence
+
+        # Column types are read once per query; rows are then decoded positionally
+        scan_pass = self.plan_scans(cursor)
+        scan_cursor = cursor.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+        select_sql = f"SELECT {', '.join(self.columns)} FROM sales"
+        if sample_rate:
+            if seed is None:
+                seed = random.randint(0, 2**31 - 1)
+            select_sql += f" TABLESAMPLE SYSTEM ({sample_rate * 100}) REPEATABLE ({seed})"
+            print(f"Approximate mode: scanning a {sample_rate:.2%} block sample (seed {seed})")
+        # Start from empty groups so the structure can be run again (e.g. by explain)
+        self.mf_struct = {}
+        self.seeded = set()
+
+        print(f"\nStarting scan for grouping variables: "
+              f"{', '.join(str(scan + 1) for scan, _, _ in scan_pass['scans'])}")
+        start = time.perf_counter()
+        if scan_pass['where']:
+            scan_cursor.execute(f"{select_sql} WHERE {scan_pass['where']}", scan_pass['params'])
+        else:
+            scan_cursor.execute(select_sql)
+        count_total, count_matched = self._scan(scan_cursor, scan_pass['scans'])
+        elapsed = time.perf_counter() - start
+        self.last_run = {'rows': count_total, 'matched': count_matched, 'time': elapsed}
+
+        rate = count_total / elapsed if elapsed > 0 else 0
+        print(f"Total rows: {count_total}, Matched rows: "
+              f"{', '.join(str(count) for count in count_matched)} ({rate:,.0f} rows/sec)")
+        scan_cursor.close()
+
+        if self.grouping_sets:
+            print("\nComputing grouping sets from the finest groups...")
+            self._compute_grouping_sets()
+        self._prune_groups()
+        if sample_rate:
+            self._scale_estimates()
+
+        if sink is not None:
+            print("\nStreaming results through the having clause...")
+            return self.emit_results(sink)
+
         print("\nApplying having clause...")
         self.evaluate_having()
-        
+
         print("\nGenerating final results...")
-        return self.get_results()
\ No newline at end of file
+        return self.get_results()
+
+    def explain(self, cursor, analyze=False):
+        """
+        Describe how the query will be executed
+
+        Parameters:
+        - cursor: database cursor
+        - analyze: if True, run the query and report actual rows and time
+          next to the estimates (EXPLAIN ANALYZE)
+
+        Returns the plan as a string.
+        """
+        if not self.columns:
+            self.load_schema(cursor)
+        if self.stats is None:
+            self.collect_statistics(cursor)
+        scan_pass = self.plan_scans(cursor)
+        if analyze:
+            self.process_all_scans(cursor)
+
+        row_count = self.stats['row_count']
+        lines = [f"EMF plan on sales (est. {row_count} rows, grouped by {', '.join(self.grouping_attrs)})"]
+
+        # With a pushed-down WHERE only rows matching some scan are fetched
+        if scan_pass['where']:
+            fetch_selectivity = min(1.0, sum(self._chain_estimates(preds)[0]
+                                             for _, preds, _ in scan_pass['scans']))
+        else:
+            fetch_selectivity = 1.0
+        est_rows = fetch_selectivity * row_count
+        est_cost = est_rows * sum(self._chain_estimates(preds)[1] for _, preds, _ in scan_pass['scans'])
+
+        scan_numbers = ', '.join(str(scan + 1) for scan, _, _ in scan_pass['scans'])
+        header = f"Single scan for grouping variables {scan_numbers} (est. rows={est_rows:.0f} cost={est_cost:.0f}"
+        if analyze:
+            header += f"; actual rows={self.last_run['rows']} time={self.last_run['time'] * 1000:.1f}ms"
+        lines.append(header + ")")
+        lines.append(f"  Pushed-down filter: {self._format_where(scan_pass) or 'none (full scan)'}")
+
+        for n, (scan, predicates, aggregates) in enumerate(scan_pass['scans']):
+            selectivity, _ = self._chain_estimates(predicates)
+            line = f"  Variable {scan + 1}: est. matches={selectivity * row_count:.0f}"
+            if analyze:
+                line += f" actual matches={self.last_run['matched'][n]}"
+            lines.append(line)
+            for predicate in predicates:
+                i, compare, value = predicate
+                column_stats = self.stats['columns'].get(self.columns[i])
+                distinct = f" distinct={column_stats['n_distinct']:.0f}" if column_stats else ''
+                lines.append(
+                    f"    check {self.columns[i]} {OPERATOR_NAMES[compare]} {self._format_literal(value)} "
+                    f"(sel={self._estimate_selectivity(predicate):.3f} cost={self._predicate_cost(predicate):.1f}{distinct})"
+                )
+            for f, agg_type, i in aggregates:
+                lines.append(f"    update {f} = {agg_type}({self.columns[i]})")
+
+        layout = []
+        for f in self.f_vect:
+            layout.append(f"{f} (sum, count)" if '_avg_' in f else f)
+        lines.append(f"Aggregate layout: key ({', '.join(self.grouping_attrs)}); {', '.join(layout)}")
+        if self.grouping_sets:
+            levels = ', '.join(f"({', '.join(level)})" for level in self.grouping_sets)
+            lines.append(f"Grouping sets: {levels} (merged from the finest groups, no extra scans)")
+        if self.having and self.having != '-':
+            lines.append(f"Having: {self.having}")
+        if analyze:
+            lines.append(f"Result groups: {len(self.mf_struct)}")
+        return '\n'.join(lines)
+
+    def _format_where(self, scan_pass):
+        """Render the pushed-down WHERE clause of a scan plan with its literals filled in"""
+        if not scan_pass['where']:
+            return None
+        literals = [self._format_literal(value) for value in scan_pass['params']]
+        return scan_pass['where'].replace('%s', '{}').format(*literals)
+
+    def _format_literal(self, value):
+        """Render a typed condition literal the way it would appear in SQL"""
+        if isinstance(value, bool):
+            return str(value).lower()
+        if isinstance(value, (int, float, Decimal)):
+            return str(value)
+        return f"'{str(value).strip()}'"
@@ -0,0 +1,283 @@
+import csv
+import json
+import math
+import struct
+import sys
+from array import array
+
+import tabulate
+
+# Binary columnar format: magic, header with column names, then chunks of
+# rows stored column by column; a chunk with zero rows ends the file
+COLUMNAR_MAGIC = b'EMFC\x01'
+NULL_LENGTH = 0xFFFFFFFF
+DEFAULT_CHUNK_SIZE = 65536
+
+
+class ResultSink:
+    """
+    Destination for finalized result rows
+
+    Rows are dictionaries with the same keys, written one at a time as
+    groups pass the having clause, so results never need to be held in
+    memory all at once. open() writes the header for the output columns,
+    so even an empty result produces a valid file. Sinks are context
+    managers that close on exit.
+    """
+    def __init__(self):
+        self.columns = None
+        self.count = 0
+
+    def open(self, columns):
+        """
+        Start the output with the given column names
+
+        Parameters:
+        - columns: names of the columns of every row, in output order
+        """
+        if self.columns is not None:
+            raise ValueError("Sink is already open")
+        self.columns = list(columns)
+        self._open()
+
+    def write(self, row):
+        """Write one result row (opening the sink with its keys if needed)"""
+        if self.columns is None:
+            self.open(row.keys())
+        self._write(row)
+        self.count += 1
+
+    def _open(self):
+        """Called with self.columns set, before any row is written"""
+
+    def _write(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        """Flush and release the underlying output"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _FileSink(ResultSink):
+    """Base class for sinks writing to a path or an open file object"""
+    binary = False
+
+    def __init__(self, output):
+        super().__init__()
+        if isinstance(output, str):
+            if self.binary:
+                self.file = open(output, 'wb')
+            else:
+                self.file = open(output, 'w', newline='')
+            self._owns_file = True
+        else:
+            self.file = output
+            self._owns_file = False
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class CsvSink(_FileSink):
+    """Stream rows to a CSV file with a header row"""
+    def close(self):
+        if self.columns is None:
+            self.open([])
+        super().close()
+
+    def _open(self):
+        self.writer = csv.DictWriter(self.file, fieldnames=self.columns)
+        self.writer.writeheader()
+
+    def _write(self, row):
+        self.writer.writerow(row)
+
+
+class JsonLinesSink(_FileSink):
+    """Stream rows to a JSON Lines file, one object per line"""
+    def _write(self, row):
+        # JSON has no infinities or NaN (e.g. max over no rows), write them as null
+        clean = {key: None if isinstance(value, float) and not math.isfinite(value) else value
+                 for key, value in row.items()}
+        self.file.write(json.dumps(clean, default=str) + '\n')
+
+
+class ColumnarSink(_FileSink):
+    """
+    Stream rows to a compact binary columnar file
+
+    Rows are buffered into chunks of chunk_size and each chunk is written
+    column by column: int64 or float64 arrays for numeric columns (with a
+    null mask when a chunk has missing values), a byte per value for
+    booleans and length-prefixed UTF-8 for everything else. Use
+    read_columnar() to read the file back.
+    """
+    binary = True
+
+    def __init__(self, output, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(output)
+        self.chunk_size = chunk_size
+        self.chunk = []
+
+    def _open(self):
+        header = json.dumps(self.columns).encode('utf-8')
+        self.file.write(COLUMNAR_MAGIC + struct.pack('<I', len(header)) + header)
+
+    def _write(self, row):
+        self.chunk.append(row)
+        if len(self.chunk) >= self.chunk_size:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        self.file.write(struct.pack('<I', len(self.chunk)))
+        for column in self.columns:
+            values = [row[column] for row in self.chunk]
+            self.file.write(_encode_column(values))
+        self.chunk = []
+
+    def close(self):
+        if self.columns is None:
+            self.open([])
+        if self.chunk:
+            self._flush_chunk()
+        self.file.write(struct.pack('<I', 0))
+        super().close()
+
+
+class TabulateSink(ResultSink):
+    """
+    Collect rows and render them as a tabulate table
+
+    This keeps every row in memory, so it is meant for small interactive outputs.
+    """
+    def __init__(self, tablefmt='psql'):
+        super().__init__()
+        self.tablefmt = tablefmt
+        self.rows = []
+
+    def _write(self, row):
+        self.rows.append(row)
+
+    def getvalue(self):
+        """Return the rendered table, or None if no rows were written"""
+        if not self.rows:
+            return None
+        return tabulate.tabulate(self.rows, headers="keys", tablefmt=self.tablefmt)
+
+
+def _native_array(typecode, values):
+    """Pack values into a little-endian array"""
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _encode_column(values):
+    """
+    Encode one column of a chunk, choosing the most compact type that fits
+
+    Type tags: q int64, d float64, b boolean, s UTF-8 strings. An upper case
+    Q or D is followed by a null mask of one byte per value before the data.
+    """
+    present = [value for value in values if value is not None]
+    if all(type(value) is bool for value in values):
+        return b'b' + bytes(values)
+    if all(type(value) is int for value in present):
+        typecode, filler = 'q', 0
+    elif all(type(value) in (int, float) for value in present):
+        typecode, filler = 'd', 0.0
+    else:
+        typecode = None
+
+    if typecode:
+        if len(present) == len(values):
+            return typecode.encode() + _native_array(typecode, values)
+        mask = bytes(value is None for value in values)
+        data = [filler if value is None else value for value in values]
+        return typecode.upper().encode() + mask + _native_array(typecode, data)
+
+    parts = [b's']
+    for value in values:
+        if value is None:
+            parts.append(struct.pack('<I', NULL_LENGTH))
+        else:
+            encoded = str(value).encode('utf-8')
+            parts.append(struct.pack('<I', len(encoded)) + encoded)
+    return b''.join(parts)
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated columnar file")
+    return data
+
+
+def read_columnar(file_path):
+    """
+    Read rows back from a file written by ColumnarSink
+
+    Parameters:
+    - file_path: path to the columnar file
+
+    Yields one dictionary per row. Values of columns stored as strings
+    (e.g. dates) are returned as str.
+    """
+    with open(file_path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{file_path} is not a columnar result file")
+        header_length, = struct.unpack('<I', _read_exact(f, 4))
+        columns = json.loads(_read_exact(f, header_length))
+
+        while True:
+            num_rows, = struct.unpack('<I', _read_exact(f, 4))
+            if num_rows == 0:
+                return
+            data = []
+            for _ in columns:
+                tag = _read_exact(f, 1)
+                if tag == b'b':
+                    data.append([bool(value) for value in _read_exact(f, num_rows)])
+                elif tag in (b'q', b'd', b'Q', b'D'):
+                    mask = _read_exact(f, num_rows) if tag.isupper() else None
+                    values = array(tag.decode().lower())
+                    values.frombytes(_read_exact(f, 8 * num_rows))
+                    if sys.byteorder == 'big':
+                        values.byteswap()
+                    values = values.tolist()
+                    if mask:
+                        values = [None if null else value for null, value in zip(mask, values)]
+                    data.append(values)
+                else:
+                    values = []
+                    for _ in range(num_rows):
+                        length, = struct.unpack('<I', _read_exact(f, 4))
+                        values.append(None if length == NULL_LENGTH else _read_exact(f, length).decode('utf-8'))
+                    data.append(values)
+            for i in range(num_rows):
+                yield {column: values[i] for column, values in zip(columns, data)}
+
+
+def open_sink(file_path):
+    """
+    Create a sink for a path, choosing the format from its extension
+
+    Parameters:
+    - file_path: .csv, .jsonl (or .json) or .emfc output path
+    """
+    if file_path.endswith('.csv'):
+        return CsvSink(file_path)
+    if file_path.endswith('.jsonl') or file_path.endswith('.json'):
+        return JsonLinesSink(file_path)
+    if file_path.endswith('.emfc'):
+        return ColumnarSink(file_path)
+    raise ValueError(f"Unknown result format for {file_path} (use .csv, .jsonl or .emfc)")
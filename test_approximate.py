@@ -0,0 +1,131 @@
+import math
+from statistics import NormalDist
+
+import pytest
+
+from mf_processor import MFStructure
+
+# z value of a 95% confidence interval
+Z = NormalDist().inv_cdf(0.975)
+
+
+def make_mf(f_vect, having, sample_rate=0.1):
+    mf = MFStructure(
+        select_attrs='cust,' + f_vect,
+        grouping_vars='1',
+        grouping_attrs='cust',
+        f_vect=f_vect,
+        conditions="1.state = 'NY'",
+        having=having
+    )
+    mf.sample_rate = sample_rate
+    return mf
+
+
+def test_having_on_sampled_min_is_uncertain_when_true_min_could_be_lower():
+    mf = make_mf('1_min_quant', '1_min_quant > 5')
+    entry = {'cust': 'Boo', '1_min_quant': 8}
+    assert mf._passes_having(entry)
+    # The true min can be anything up to the sample min
+    assert entry['having_uncertain'] is True
+
+
+def test_having_on_sampled_min_is_certain_when_it_already_fails_below():
+    mf = make_mf('1_min_quant', '1_min_quant < 5')
+    entry = {'cust': 'Boo', '1_min_quant': 3}
+    assert mf._passes_having(entry)
+    assert entry['having_uncertain'] is False
+
+
+def test_having_on_sampled_max_uses_lower_bound():
+    mf = make_mf('1_max_quant', '1_max_quant < 900')
+    entry = {'cust': 'Boo', '1_max_quant': 850}
+    assert mf._passes_having(entry)
+    assert entry['having_uncertain'] is True
+
+    mf = make_mf('1_max_quant', '1_max_quant > 800')
+    entry = {'cust': 'Boo', '1_max_quant': 850}
+    assert mf._passes_having(entry)
+    assert entry['having_uncertain'] is False
+
+
+def test_having_on_min_max_is_certain_on_the_full_table():
+    mf = make_mf('1_min_quant', '1_min_quant > 5', sample_rate=1)
+    entry = {'cust': 'Boo', '1_min_quant': 8}
+    assert mf._passes_having(entry)
+    assert entry['having_uncertain'] is False
+
+
+def scaled_entry(mf, **values):
+    entry = mf._initialize_aggregates()
+    entry.update(cust='Boo', **values)
+    mf.mf_struct = {'Boo': entry}
+    mf._scale_estimates()
+    return entry
+
+
+def test_scale_count_and_sum():
+    mf = make_mf('1_count_quant,1_sum_quant', '-')
+    entry = scaled_entry(mf, **{'1_count_quant': 40, '1_sum_quant': 1000, '1_sum_quant_sumsq': 50000})
+
+    assert entry['1_count_quant'] == pytest.approx(400)
+    assert entry['1_count_quant_ci'] == pytest.approx(Z * math.sqrt(40 * 0.9) / 0.1)
+    assert entry['1_sum_quant'] == pytest.approx(10000)
+    assert entry['1_sum_quant_ci'] == pytest.approx(Z * math.sqrt(50000 * 0.9) / 0.1)
+
+
+def test_scale_zero_count_uses_rule_of_three_bound():
+    mf = make_mf('1_count_quant,1_sum_quant', '-')
+    entry = scaled_entry(mf)
+
+    assert entry['1_count_quant'] == 0
+    # -ln(0.05) / 0.1 is about 3 / 0.1
+    assert entry['1_count_quant_ci'] == pytest.approx(-math.log(0.05) / 0.1)
+    assert entry['1_sum_quant_ci'] is None
+
+
+def test_scale_avg_interval():
+    mf = make_mf('1_avg_quant', '-')
+    # Values 2, 4 and 6: mean 4, sample variance 4
+    entry = scaled_entry(mf, **{'1_avg_quant_sum': 12, '1_avg_quant_count': 3, '1_avg_quant_sumsq': 56})
+    assert entry['1_avg_quant_sum'] == 12
+    assert entry['1_avg_quant_ci'] == pytest.approx(Z * math.sqrt(4 * 0.9 / 3))
+
+    entry = scaled_entry(mf, **{'1_avg_quant_sum': 5, '1_avg_quant_count': 1, '1_avg_quant_sumsq': 25})
+    assert entry['1_avg_quant_ci'] is None
+
+
+def test_scale_full_table_has_exact_values():
+    mf = make_mf('1_count_quant,1_sum_quant', '-', sample_rate=1)
+    entry = scaled_entry(mf, **{'1_count_quant': 0})
+    assert entry['1_count_quant_ci'] == 0
+    assert entry['1_sum_quant_ci'] == 0
+
+
+def test_having_uncertain_within_interval():
+    mf = make_mf('1_count_quant', '1_count_quant > 250')
+    entry = scaled_entry(mf, **{'1_count_quant': 40})
+    # 400 +- 117.6 stays above 250
+    assert mf._passes_having(entry)
+    assert entry['having_uncertain'] is False
+
+    mf = make_mf('1_count_quant', '1_count_quant > 395')
+    entry = scaled_entry(mf, **{'1_count_quant': 40})
+    assert mf._passes_having(entry)
+    assert entry['having_uncertain'] is True
+
+
+def test_uncertain_rejections_are_counted():
+    mf = make_mf('1_count_quant', '1_count_quant > 450')
+    entry = scaled_entry(mf, **{'1_count_quant': 40})
+    mf.evaluate_having()
+    assert mf.mf_struct == {}
+    assert mf.uncertain_rejections == 1
+
+
+def test_having_on_aggregate_without_interval_is_uncertain():
+    mf = make_mf('1_sum_quant', '1_sum_quant < 100')
+    entry = scaled_entry(mf)
+    assert entry['1_sum_quant_ci'] is None
+    assert mf._passes_having(entry)
+    assert entry['having_uncertain'] is True
@@ -0,0 +1,138 @@
+import operator
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from mf_processor import MFStructure
+
+CATALOG = [
+    ('cust', 'character varying', 20),
+    ('prod', 'character varying', 20),
+    ('day', 'integer', None),
+    ('month', 'integer', None),
+    ('year', 'integer', None),
+    ('state', 'character', 3),
+    ('quant', 'integer', None),
+    ('date', 'date', None),
+    ('price', 'numeric', None),
+    ('promo', 'boolean', None),
+    ('sold_at', 'timestamp without time zone', None),
+    ('location', 'point', None),
+]
+
+
+class CatalogCursor:
+    """Cursor answering the information_schema query of load_schema()"""
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=None):
+        self.params = params
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+def make_mf(f_vect='1_sum_quant,1_max_quant,1_count_quant'):
+    mf = MFStructure(
+        select_attrs='cust,' + f_vect,
+        grouping_vars='1',
+        grouping_attrs='cust',
+        f_vect=f_vect,
+        conditions="1.state = 'NY'",
+        having='-'
+    )
+    mf.load_schema(CatalogCursor(CATALOG))
+    return mf
+
+
+def test_load_schema_maps_catalog_types():
+    mf = make_mf()
+    assert mf.columns == [name for name, _, _ in CATALOG]
+    assert mf.column_index['quant'] == 6
+    assert mf.schema['price'] == 'numeric'
+    assert mf.schema['sold_at'] == 'timestamp'
+    assert mf.schema['location'] == 'point'
+    assert mf.char_lengths == {'state': 3}
+
+
+def test_load_schema_raises_for_missing_table():
+    mf = make_mf()
+    with pytest.raises(ValueError):
+        mf.load_schema(CatalogCursor([]), table='missing')
+
+
+def test_convert_literal_types():
+    mf = make_mf()
+    # char(n) values come back blank-padded from the database
+    assert mf._convert_literal('state', 'NY') == 'NY '
+    assert mf._convert_literal('cust', 'Dan') == 'Dan'
+    assert mf._convert_literal('quant', '42') == 42
+    assert mf._convert_literal('price', '1.10') == Decimal('1.10')
+    assert mf._convert_literal('date', '2016-06-17') == date(2016, 6, 17)
+    assert mf._convert_literal('sold_at', '2016-06-17 10:30:00') == datetime(2016, 6, 17, 10, 30)
+    assert mf._convert_literal('promo', 'TRUE') is True
+    assert mf._convert_literal('promo', 'false') is False
+
+
+@pytest.mark.parametrize('field, value', [
+    ('promo', 'yes'),
+    ('quant', 'many'),
+    ('date', '17/06/2016'),
+    ('location', '(1, 2)'),
+])
+def test_convert_literal_rejects_invalid_values(field, value):
+    with pytest.raises(ValueError):
+        make_mf()._convert_literal(field, value)
+
+
+def test_compile_condition_binds_positions_and_literals():
+    mf = make_mf()
+    assert mf._compile_condition("1.state = 'NY' and 1.quant >= 10 and 1.date < '2017-01-01'") == [
+        (5, operator.eq, 'NY '),
+        (6, operator.ge, 10),
+        (7, operator.lt, date(2017, 1, 1)),
+    ]
+    assert mf._compile_condition('-') == []
+
+
+@pytest.mark.parametrize('condition', [
+    "1.country = 'US'",
+    "1.quant > 1_sum_quant",
+    "1.quant > 'lots'",
+    "1.state ~ 'NY'",
+    "1.quant = 1 = 2",
+])
+def test_compile_condition_rejects_conditions_it_cannot_bind(condition):
+    with pytest.raises(ValueError):
+        make_mf()._compile_condition(condition)
+
+
+def test_bound_predicates_fail_on_null():
+    mf = make_mf()
+    check = mf._bind_predicates(mf._compile_condition("1.state = 'NY' and 1.quant > 5"))
+    row = ['Dan', 'Ham', 17, 6, 2016, 'NY ', 10, date(2016, 6, 17), None, None, None, None]
+    assert check(tuple(row))
+    assert not check(tuple(row[:6] + [None] + row[7:]))
+    assert not check(tuple(row[:5] + [None] + row[6:]))
+    assert not check(tuple(row[:6] + [3] + row[7:]))
+    assert mf._bind_predicates([]) is None
+
+
+def test_scan_skips_null_values_in_aggregates():
+    mf = make_mf()
+    scans = [(0, mf._compile_condition(mf.conditions[0]), mf._compile_aggregates(0))]
+    rows = [
+        ('Dan', 'Ham', 1, 1, 2016, 'NY ', 10, None, None, None, None, None),
+        ('Dan', 'Ham', 2, 1, 2016, 'NY ', None, None, None, None, None, None),
+        ('Dan', 'Ham', 3, 1, 2016, None, 99, None, None, None, None, None),
+        ('Dan', 'Ham', 4, 1, 2016, 'NY ', 5, None, None, None, None, None),
+    ]
+    count_total, count_matched = mf._scan(rows, scans)
+
+    assert (count_total, count_matched) == (4, [3])
+    entry = mf.mf_struct['Dan']
+    assert entry['1_sum_quant'] == 15
+    assert entry['1_max_quant'] == 10
+    assert entry['1_count_quant'] == 2
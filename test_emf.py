@@ -18,7 +18,8 @@ def test_emf_processing():
         grouping_attrs=','.join(phi.grouping_attrs),
         f_vect=','.join(phi.f_vect),
         conditions=';'.join(phi.conditions),
-        having=phi.having
+        having=phi.having,
+        grouping_sets=phi.grouping_sets
     )
 
     # Connect to database
@@ -0,0 +1,156 @@
+from datetime import date
+
+import pytest
+
+from mf_processor import MFStructure
+
+CATALOG = [
+    ('cust', 'character varying', 20),
+    ('prod', 'character varying', 20),
+    ('day', 'integer', None),
+    ('month', 'integer', None),
+    ('year', 'integer', None),
+    ('state', 'character', 2),
+    ('quant', 'integer', None),
+    ('date', 'date', None),
+]
+
+ROWS = [
+    ('Dan', 'Ham', 1, 1, 2016, 'NY', 10, date(2016, 1, 1)),
+    ('Dan', 'Ham', 2, 1, 2016, 'NY', 20, date(2016, 1, 2)),
+    ('Dan', 'Eggs', 3, 1, 2016, 'NJ', 5, date(2016, 1, 3)),
+    ('Mia', 'Ham', 4, 1, 2016, 'NY', 7, date(2016, 1, 4)),
+    ('Mia', 'Eggs', 5, 1, 2016, 'CT', 1, date(2016, 1, 5)),
+]
+
+
+class StubCursor:
+    """
+    Cursor returning the catalog for schema queries and ROWS for the scan
+
+    The pushed-down WHERE and TABLESAMPLE are ignored: the engine checks
+    every condition again, and a sample is simulated by the full table.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        if 'information_schema' in sql:
+            self.rows = CATALOG
+        elif 'pg_class' in sql:
+            self.rows = [(len(ROWS),)]
+        elif 'pg_stats' in sql:
+            self.rows = []
+        else:
+            self.rows = ROWS
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    def cursor(self, cursor_factory=None):
+        return StubCursor(self)
+
+
+def make_mf(grouping_sets='-', conditions="1.state = 'NY';2.state = 'NJ'"):
+    return MFStructure(
+        select_attrs='cust,prod,1_sum_quant,1_max_quant,2_count_quant',
+        grouping_vars='2',
+        grouping_attrs='cust,prod',
+        f_vect='1_sum_quant,1_max_quant,2_count_quant',
+        conditions=conditions,
+        having='-',
+        grouping_sets=grouping_sets
+    )
+
+
+def run(mf, sample_rate=None):
+    return mf.process_all_scans(StubConnection().cursor(), sample_rate=sample_rate, seed=1)
+
+
+def test_parse_rollup_and_cube():
+    assert make_mf('ROLLUP').grouping_sets == [('cust', 'prod'), ('cust',), ()]
+    assert make_mf('rollup(prod, cust)').grouping_sets == [('cust', 'prod'), ('prod',), ()]
+    assert make_mf('CUBE').grouping_sets == [('cust', 'prod'), ('cust',), ('prod',), ()]
+    assert make_mf('CUBE (prod)').grouping_sets == [('prod',), ()]
+    assert make_mf('-').grouping_sets is None
+
+
+def test_parse_explicit_sets_removes_duplicates():
+    mf = make_mf('(prod, cust), (cust), (cust, prod), ()')
+    assert mf.grouping_sets == [('cust', 'prod'), ('cust',), ()]
+
+
+@pytest.mark.parametrize('spec', [
+    '(cust), prod',
+    'ROLLUP(cust) extra',
+    'GROUPING SETS ((cust))',
+    '(state)',
+    '(cust, cust)',
+    'CUBE()',
+])
+def test_parse_rejects_invalid_specifications(spec):
+    with pytest.raises(ValueError):
+        make_mf(spec)
+
+
+def test_rollup_matches_merged_groups():
+    results = run(make_mf('ROLLUP'))
+    by_key = {(row['cust'], row['prod']): row for row in results}
+
+    # Finest groups seeded by grouping variable 1 (state = 'NY')
+    assert by_key[('Dan', 'Ham')]['1_sum_quant'] == 30
+    assert by_key[('Mia', 'Ham')]['1_max_quant'] == 7
+    # (Dan, Eggs) is never matched by variable 1 but is merged into (Dan)
+    assert ('Dan', 'Eggs') not in by_key
+    assert by_key[('Dan', None)]['2_count_quant'] == 1
+    assert by_key[('Dan', None)]['1_sum_quant'] == 30
+    assert by_key[(None, None)]['1_sum_quant'] == 37
+    assert by_key[(None, None)]['1_max_quant'] == 20
+    # (Mia, Eggs) only matches no variable, so Mia's total only holds Ham
+    assert by_key[('Mia', None)]['1_sum_quant'] == 7
+    assert len(results) == 5
+
+
+def test_duplicate_levels_are_not_counted_twice():
+    results = run(make_mf('(prod), (prod), ()'))
+    by_key = {(row['cust'], row['prod']): row for row in results}
+    assert by_key[(None, 'Ham')]['1_sum_quant'] == 37
+    assert by_key[(None, None)]['1_sum_quant'] == 37
+    assert by_key[(None, None)]['2_count_quant'] == 1
+    # No Eggs group is matched by variable 1
+    assert len(results) == 2
+
+
+def test_grouping_sets_without_finest_level():
+    results = run(make_mf('(cust)'))
+    assert [(row['cust'], row['prod'], row['1_sum_quant']) for row in results] == [
+        ('Dan', None, 30),
+        ('Mia', None, 7),
+    ]
+
+
+def test_running_twice_gives_the_same_results():
+    mf = make_mf('ROLLUP')
+    first = run(mf)
+    mf.explain(StubConnection().cursor(), analyze=True)
+    assert run(mf) == first
+
+
+def test_sampled_grouping_sets_are_scaled_once():
+    exact = run(make_mf('ROLLUP'))
+    # The stub returns every row, so a 50% "sample" doubles counts and sums
+    sampled = run(make_mf('ROLLUP'), sample_rate=0.5)
+
+    assert [(row['cust'], row['prod']) for row in sampled] == [(row['cust'], row['prod']) for row in exact]
+    for estimate, row in zip(sampled, exact):
+        assert estimate['1_sum_quant'] == 2 * row['1_sum_quant']
+        assert estimate['2_count_quant'] == 2 * row['2_count_quant']
+        assert estimate['1_max_quant'] == row['1_max_quant']
@@ -0,0 +1,41 @@
+import functools
+from datetime import date
+
+from loader import DEFAULT_SQL_SCRIPT, SALES_COLUMNS, read_csv_rows, read_sql_script_rows, scale_rows
+
+
+def test_read_sql_script_rows():
+    rows = list(read_sql_script_rows(DEFAULT_SQL_SCRIPT))
+    assert len(rows) == 10000
+    assert rows[0] == ('Dan', 'Ham', '17', '6', '2016', 'PA', '825', '2016-06-17')
+    assert all(len(row) == len(SALES_COLUMNS) for row in rows)
+
+
+def test_read_csv_rows_skips_header(tmp_path):
+    path = tmp_path / 'sales.csv'
+    path.write_text("cust,prod,day,month,year,state,quant,date\nDan, Ham,17,6,2016,PA,825,2016-06-17\n")
+    assert list(read_csv_rows(str(path))) == [('Dan', 'Ham', '17', '6', '2016', 'PA', '825', '2016-06-17')]
+
+
+def test_scale_rows_replicates_base_rows():
+    read_rows = functools.partial(read_sql_script_rows, DEFAULT_SQL_SCRIPT)
+    base = list(read_rows())
+    assert list(scale_rows(read_rows, 3)) == base * 3
+
+
+def test_scale_rows_perturbs_copies_consistently():
+    base = [('Dan', 'Ham', '17', '6', '2016', 'PA', '825', '2016-06-17')]
+    rows = list(scale_rows(lambda: iter(base), 50, perturb=True, seed=1))
+
+    assert len(rows) == 50
+    assert rows[0] == base[0]
+    for cust, prod, day, month, year, state, quant, sale_date in rows[1:]:
+        assert (cust, prod, month, year, state) == ('Dan', 'Ham', 6, 2016, 'PA')
+        assert 742 <= quant <= 908
+        assert sale_date == date(year, month, day).isoformat()
+
+
+def test_scale_rows_is_reproducible_with_seed():
+    base = [('Mia', 'Eggs', '1', '2', '2018', 'NY', '40', '2018-02-01')]
+    first = list(scale_rows(lambda: base, 10, perturb=True, seed=7))
+    assert first == list(scale_rows(lambda: base, 10, perturb=True, seed=7))
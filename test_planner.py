@@ -0,0 +1,148 @@
+import operator
+
+import pytest
+
+from mf_processor import DEFAULT_RANGE_SELECTIVITY, DEFAULT_SELECTIVITY, MFStructure
+
+CATALOG = [
+    ('cust', 'character varying', 20),
+    ('prod', 'character varying', 20),
+    ('day', 'integer', None),
+    ('month', 'integer', None),
+    ('year', 'integer', None),
+    ('state', 'character', 2),
+    ('quant', 'integer', None),
+    ('date', 'date', None),
+]
+
+# pg_stats rows: attname, null_frac, n_distinct, most_common_vals, most_common_freqs, histogram_bounds
+PG_STATS = [
+    ('state', 0.0, 4.0, ['NY', 'NJ', 'CT', 'PA'], [0.4, 0.3, 0.2, 0.1], None),
+    ('year', 0.0, 5.0, ['2016', '2017', '2018', '2019', '2020'], [0.2, 0.2, 0.2, 0.2, 0.2], None),
+    ('quant', 0.0, -0.1, None, None, ['1', '250', '500', '750', '1000']),
+    ('cust', 0.1, 10.0, ['Dan'], [0.5], None),
+    ('dropped', 0.0, 1.0, ['x'], [1.0], None),
+]
+
+
+class CatalogCursor:
+    """Cursor answering the catalog queries of load_schema() and collect_statistics()"""
+    def __init__(self, row_count=10000, stats=PG_STATS):
+        self.row_count = row_count
+        self.stats = stats
+        self.queries = []
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+        if 'information_schema' in sql:
+            self.rows = CATALOG
+        elif 'pg_class' in sql:
+            self.rows = [(self.row_count,)]
+        elif 'pg_stats' in sql:
+            self.rows = self.stats
+        else:
+            raise AssertionError(f"Unexpected query: {sql}")
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+def make_mf(conditions, grouping_vars='1'):
+    n = int(grouping_vars)
+    f_vect = ','.join(f"{i + 1}_sum_quant" for i in range(n))
+    mf = MFStructure(
+        select_attrs='cust,' + f_vect,
+        grouping_vars=grouping_vars,
+        grouping_attrs='cust',
+        f_vect=f_vect,
+        conditions=conditions,
+        having='-'
+    )
+    mf.load_schema(CatalogCursor())
+    return mf
+
+
+def test_collect_statistics_reads_pg_stats():
+    mf = make_mf("1.state = 'NY'")
+    cursor = CatalogCursor()
+    stats = mf.collect_statistics(cursor)
+
+    # Only catalog queries, no pass over the table
+    assert not any('FROM sales' in sql for sql in cursor.queries)
+    assert stats['row_count'] == 10000
+    assert set(stats['columns']) == {'state', 'year', 'quant', 'cust'}
+    assert stats['columns']['year']['mcv'] == {2016: 0.2, 2017: 0.2, 2018: 0.2, 2019: 0.2, 2020: 0.2}
+    assert stats['columns']['quant']['histogram'] == [1, 250, 500, 750, 1000]
+    # A negative n_distinct is a fraction of the row count
+    assert stats['columns']['quant']['n_distinct'] == 1000
+    assert stats['columns']['state']['n_distinct'] == 4
+
+
+def test_collect_statistics_without_analyze():
+    mf = make_mf("1.state = 'NY'")
+    stats = mf.collect_statistics(CatalogCursor(row_count=-1, stats=[]))
+    assert stats == {'row_count': 0, 'columns': {}}
+
+
+def test_estimate_selectivity_from_statistics():
+    mf = make_mf("1.state = 'NY'")
+    mf.collect_statistics(CatalogCursor())
+    state, quant, cust = mf.column_index['state'], mf.column_index['quant'], mf.column_index['cust']
+
+    assert mf._estimate_selectivity((state, operator.eq, 'NJ')) == pytest.approx(0.3)
+    assert mf._estimate_selectivity((state, operator.eq, 'TX')) == 0
+    assert mf._estimate_selectivity((state, operator.ne, 'NY')) == pytest.approx(0.6)
+    assert mf._estimate_selectivity((state, operator.le, 'NJ')) == pytest.approx(0.5)
+    assert mf._estimate_selectivity((quant, operator.gt, 500)) == pytest.approx(0.4)
+    # Values other than the most common share the remaining non-NULL rows
+    assert mf._estimate_selectivity((cust, operator.eq, 'Mia')) == pytest.approx(0.4 / 9)
+    assert mf._estimate_selectivity((cust, operator.ne, 'Dan')) == pytest.approx(0.4)
+
+
+def test_estimate_selectivity_without_statistics():
+    mf = make_mf("1.state = 'NY'")
+    month, state = mf.column_index['month'], mf.column_index['state']
+    assert mf._estimate_selectivity((state, operator.eq, 'NY')) == DEFAULT_SELECTIVITY['=']
+    mf.collect_statistics(CatalogCursor())
+    assert mf._estimate_selectivity((month, operator.ne, 3)) == DEFAULT_SELECTIVITY['!=']
+    assert mf._estimate_selectivity((month, operator.gt, 3)) == DEFAULT_RANGE_SELECTIVITY
+
+
+def test_order_predicates_by_rank():
+    mf = make_mf("1.state = 'NY'")
+    mf.collect_statistics(CatalogCursor())
+    state, year, quant = mf.column_index['state'], mf.column_index['year'], mf.column_index['quant']
+    predicates = [(state, operator.eq, 'NY'), (quant, operator.gt, 500), (year, operator.eq, 2016)]
+
+    # rank = (selectivity - 1) / cost: year -0.8, quant -0.6, state -0.3 (char costs twice as much)
+    assert mf._order_predicates(predicates) == [predicates[2], predicates[1], predicates[0]]
+    selectivity, cost = mf._chain_estimates(mf._order_predicates(predicates))
+    assert selectivity == pytest.approx(0.2 * 0.4 * 0.4)
+    assert cost == pytest.approx(1.0 + 0.2 * 1.0 + 0.2 * 0.4 * 2.0)
+
+
+def test_plan_scans_pushes_down_conditions():
+    mf = make_mf("1.state = 'NY' and 1.year = 2016; 2.quant > 500", grouping_vars='2')
+    plan = mf.plan_scans(CatalogCursor())
+
+    assert [scan for scan, _, _ in plan['scans']] == [0, 1]
+    assert plan['where'] == '(year = %s AND state = %s) OR (quant > %s)'
+    assert plan['params'] == [2016, 'NY', 500]
+    assert mf._format_where(plan) == "(year = 2016 AND state = 'NY') OR (quant > 500)"
+    assert plan['scans'][1][2] == [('2_sum_quant', 'sum', mf.column_index['quant'])]
+
+
+def test_plan_scans_without_pushdown_for_unconditioned_variable():
+    mf = make_mf("1.state = 'NY'; -", grouping_vars='2')
+    cursor = CatalogCursor()
+    plan = mf.plan_scans(cursor)
+    assert plan['where'] is None
+    assert plan['params'] == []
+    # Single predicates need no ordering, so no statistics are read
+    assert mf.stats is None
+
+
+def test_plan_scans_requires_a_condition_per_variable():
+    mf = make_mf("1.state = 'NY'", grouping_vars='2')
+    with pytest.raises(ValueError):
+        mf.plan_scans(CatalogCursor())
@@ -0,0 +1,60 @@
+import csv
+import json
+
+from sinks import ColumnarSink, CsvSink, JsonLinesSink, open_sink, read_columnar
+
+COLUMNS = ['cust', 'count_1_quant', 'avg_2_quant', 'having_uncertain', 'date']
+
+ROWS = [
+    {'cust': 'Dan', 'count_1_quant': 3, 'avg_2_quant': 12.5, 'having_uncertain': False, 'date': '2016-06-17'},
+    {'cust': None, 'count_1_quant': None, 'avg_2_quant': 4, 'having_uncertain': True, 'date': None},
+    {'cust': 'Émilie', 'count_1_quant': -7, 'avg_2_quant': None, 'having_uncertain': False, 'date': '2020-01-01'},
+]
+
+
+def test_columnar_round_trip_with_nulls(tmp_path):
+    path = str(tmp_path / 'results.emfc')
+    # A small chunk size spreads the rows over chunks with and without nulls
+    with ColumnarSink(path, chunk_size=2) as sink:
+        sink.open(COLUMNS)
+        for row in ROWS:
+            sink.write(row)
+
+    rows = list(read_columnar(path))
+    assert rows == ROWS
+    assert type(rows[1]['avg_2_quant']) is float
+    assert type(rows[0]['having_uncertain']) is bool
+
+
+def test_columnar_empty_result(tmp_path):
+    path = str(tmp_path / 'empty.emfc')
+    with ColumnarSink(path) as sink:
+        sink.open(COLUMNS)
+    assert list(read_columnar(path)) == []
+
+    unopened = str(tmp_path / 'unopened.emfc')
+    ColumnarSink(unopened).close()
+    assert list(read_columnar(unopened)) == []
+
+
+def test_csv_empty_result_has_header(tmp_path):
+    path = str(tmp_path / 'empty.csv')
+    with CsvSink(path) as sink:
+        sink.open(COLUMNS)
+    with open(path, newline='') as f:
+        assert list(csv.reader(f)) == [COLUMNS]
+
+
+def test_jsonl_writes_non_finite_values_as_null(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    with JsonLinesSink(path) as sink:
+        sink.write({'cust': 'Dan', 'max_1_quant': float('-inf')})
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == [{'cust': 'Dan', 'max_1_quant': None}]
+
+
+def test_open_sink_chooses_format_by_extension(tmp_path):
+    for name, sink_type in [('a.csv', CsvSink), ('a.jsonl', JsonLinesSink), ('a.emfc', ColumnarSink)]:
+        sink = open_sink(str(tmp_path / name))
+        assert type(sink) is sink_type
+        sink.close()